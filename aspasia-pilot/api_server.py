@@ -1,12 +1,21 @@
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import HTMLResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
-from typing import Dict, Any, List, Optional, Literal, Union
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from typing import Dict, Any, Callable, List, Optional, Literal, Sequence, Tuple, Union
 from dataclasses import dataclass
+from collections import Counter
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from contextlib import asynccontextmanager
 import yaml
+try: from yaml import CSafeLoader as SafeLoader  # libyaml-backed parser
+except ImportError: from yaml import SafeLoader
 import textwrap
 import json
+from pathlib import Path
 
 # ==========================================
 # 1. THE LOGIC ENGINE (AST & COMPILER)
@@ -14,41 +23,28 @@ import json
 
 Decision = Literal["allow", "block", "flag"]
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Condition:
     field: str
     op: str
     value: Any
+    path: Tuple[str, ...]
 
-    def _get_nested(self, tx: Dict[str, Any]) -> Any:
-        current: Any = tx
-        for part in self.field.split("."):
-            if not isinstance(current, dict) or part not in current:
-                return None
-            current = current[part]
-        return current
-
-    def eval(self, tx: Dict[str, Any]) -> bool:
-        v = self._get_nested(tx)
-        if v is None: return False
-        if self.op == "gt": return v > self.value
-        if self.op == "lt": return v < self.value
-        if self.op == "eq": return v == self.value
-        if self.op == "in": return v in self.value
-        raise ValueError(f"Unknown operator: {self.op!r}")
-
-@dataclass
+@dataclass(frozen=True, slots=True)
 class CompositeCondition:
     mode: Literal["all", "any"]
-    children: List["Node"]
+    children: Tuple["Node", ...]
 
-    def eval(self, tx: Dict[str, Any]) -> bool:
-        if self.mode == "all": return all(child.eval(tx) for child in self.children)
-        else: return any(child.eval(tx) for child in self.children)
+# build_node tags each composite by mode with its own type; conjuncts() uses it.
+class AllCondition(CompositeCondition):
+    __slots__ = ()
+
+class AnyCondition(CompositeCondition):
+    __slots__ = ()
 
 Node = Union[Condition, CompositeCondition]
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Rule:
     name: str
     root: Node
@@ -58,12 +54,224 @@ class Rule:
 def build_node(spec: Dict[str, Any]) -> Node:
     if "all" in spec or "any" in spec:
         mode = "all" if "all" in spec else "any"
-        children = [build_node(child) for child in spec[mode]]
-        return CompositeCondition(mode=mode, children=children)
-    return Condition(field=spec["field"], op=spec["op"], value=spec["value"])
-
-def load_rules_from_yaml(yaml_text: str) -> List[Rule]:
-    raw = yaml.safe_load(textwrap.dedent(yaml_text))
+        # Flatten while building: same-mode composites are spliced into their
+        # parent and a single child stands in for its composite, so nesting in
+        # the YAML costs no extra parentheses in compiled code.
+        children: List[Node] = []
+        for child in map(build_node, spec[mode]):
+            if isinstance(child, CompositeCondition) and child.mode == mode:
+                children.extend(child.children)
+            else: children.append(child)
+        if len(children) == 1: return children[0]
+        cls = AllCondition if mode == "all" else AnyCondition
+        return cls(mode=mode, children=tuple(children))
+    op, value = spec["op"], spec["value"]
+    if op == "in" and isinstance(value, list):
+        # Set membership is O(1); lists holding unhashable items stay lists.
+        try: value = frozenset(value)
+        except TypeError: pass
+    return Condition(
+        field=spec["field"], op=op, value=value, path=tuple(spec["field"].split(".")),
+    )
+
+# Rules are compiled once to flat Python functions so evaluation skips the
+# recursive tree walk. Rule values are bound into the function's namespace
+# by name rather than repr()'d, so any YAML scalar (e.g. .inf) round-trips.
+OP_TEMPLATES = {
+    "gt": "{v} > {c}", "lt": "{v} < {c}", "eq": "{v} == {c}", "in": "{v} in {c}",
+}
+
+def collect_paths(node: Node, paths: Dict[Tuple[str, ...], None]) -> None:
+    if isinstance(node, CompositeCondition):
+        for child in node.children: collect_paths(child, paths)
+    else: paths.setdefault(node.path)
+
+def render_node(node: Node, env: Dict[str, Any], refs: Dict[Tuple[str, ...], str]) -> str:
+    if isinstance(node, CompositeCondition):
+        if not node.children: return "True" if node.mode == "all" else "False"
+        joiner = " and " if node.mode == "all" else " or "
+        return "(" + joiner.join(render_node(c, env, refs) for c in node.children) + ")"
+
+    if node.op not in OP_TEMPLATES:
+        raise ValueError(f"Unknown operator: {node.op!r}")
+    const = f"_c{len(env)}"
+    env[const] = node.value
+
+    # refs maps each path to the expression holding its already-resolved value
+    # (see render_loader). A missing or None value makes the condition False.
+    ref = refs[node.path]
+    if ref.isidentifier():
+        var, steps = ref, [f"{ref} is not None"]
+    else:
+        var = f"{const}_v"
+        steps = [f"({var} := {ref}) is not None"]
+    if isinstance(node.value, frozenset):
+        steps.append(f"{var}.__hash__ is not None")
+    steps.append(OP_TEMPLATES[node.op].format(v=var, c=const))
+    return "(" + " and ".join(steps) + ")"
+
+def render_loader(
+    paths: List[Tuple[str, ...]],
+) -> Tuple[List[str], Dict[Tuple[str, ...], str]]:
+    """Statements that resolve every path from `tx` into a local, walking each
+    shared prefix (e.g. `originator`) once. A path through a non-dict
+    resolves to None."""
+    names: Dict[Tuple[str, ...], str] = {(): "tx"}
+    lines = []
+    for path in paths:
+        for depth in range(1, len(path) + 1):
+            prefix = path[:depth]
+            if prefix in names: continue
+            parent, var = names[prefix[:-1]], f"_p{len(names)}"
+            key = repr(prefix[-1])
+            if depth == 1: lines.append(f"{var} = tx.get({key})")
+            else:
+                lines.append(
+                    f"{var} = {parent}.get({key}) if isinstance({parent}, dict) else None"
+                )
+            names[prefix] = var
+    return lines, names
+
+def compile_function(name: str, args: str, lines: List[str], env: Dict[str, Any],
+                     filename: str) -> Callable:
+    src = f"def {name}({args}):\n" + "".join(f"    {line}\n" for line in lines)
+    exec(compile(src, filename, "exec"), env)
+    return env[name]
+
+def compile_rule(rule: Rule,
+                 refs: Dict[Tuple[str, ...], str]) -> Callable[[Tuple[Any, ...]], bool]:
+    env: Dict[str, Any] = {}
+    lines = [f"return {render_node(rule.root, env, refs)}"]
+    return compile_function("_rule", "ctx", lines, env, f"<rule {rule.name}>")
+
+def compile_loader(
+    paths: List[Tuple[str, ...]],
+) -> Callable[[Dict[str, Any]], Tuple[Any, ...]]:
+    """Build `tx -> ctx`: one tuple holding the value of every path."""
+    lines, names = render_loader(paths)
+    lines.append(f"return ({''.join(names[p] + ', ' for p in paths)})")
+    return compile_function("_load", "tx", lines, {}, "<rule paths>")
+
+# Nested `if`s past this depth are emitted flat; Python caps indentation at 100.
+MAX_SHARED_DEPTH = 32
+
+def conjuncts(node: Node) -> Tuple[Node, ...]:
+    return node.children if isinstance(node, AllCondition) else (node,)
+
+def render_rules(items: List[Tuple[Tuple[Node, ...], str]], env: Dict[str, Any],
+                 names: Dict[Tuple[str, ...], str], depth: int = 0) -> List[str]:
+    """`if ...: return <rule>` lines for (conjuncts, rule var) pairs in
+    precedence order. Consecutive rules opening with the same condition share
+    one test of it, nested a level down; a rule with nothing left to test
+    returns, and anything after it in the group could never be reached."""
+    indent = "    " * depth
+    lines: List[str] = []
+    i = 0
+    while i < len(items):
+        conds, var = items[i]
+        if not conds:
+            lines.append(f"{indent}return {var}")
+            break
+        j = i + 1
+        if depth < MAX_SHARED_DEPTH:
+            while j < len(items) and items[j][0][:1] == conds[:1]: j += 1
+        if j - i == 1:
+            test = " and ".join(render_node(c, env, names) for c in conds)
+            lines.append(f"{indent}if {test}: return {var}")
+        else:
+            lines.append(f"{indent}if {render_node(conds[0], env, names)}:")
+            rest = [(c[1:], v) for c, v in items[i:j]]
+            lines.extend(render_rules(rest, env, names, depth + 1))
+        i = j
+    return lines
+
+def compile_decider(rules: List[Rule]) -> Callable[[Dict[str, Any]], Optional[Rule]]:
+    """Compile a rule set, given in precedence order, into one straight-line
+    function: resolve the fields, then `if <rule>: return <rule>` per rule, so
+    the first match is the winner and nothing after it runs. Leading
+    conditions shared by neighbouring rules are tested once (render_rules)."""
+    paths: Dict[Tuple[str, ...], None] = {}
+    for rule in rules: collect_paths(rule.root, paths)
+    lines, names = render_loader(list(paths))
+    env: Dict[str, Any] = {}
+    items = []
+    for i, rule in enumerate(rules):
+        env[f"_r{i}"] = rule
+        items.append((conjuncts(rule.root), f"_r{i}"))
+    lines.extend(render_rules(items, env, names))
+    lines.append("return None")
+    return compile_function("_decide", "tx", lines, env, "<rule set>")
+
+# Big rule sets remember the winning rule per distinct combination of the
+# values they read. Below CACHE_MIN_RULES the compiled decider beats the key
+# build plus lookup, so no cache is used.
+CACHE_MIN_RULES = 32
+DECISION_CACHE_SIZE = 8192
+
+def bucket(thresholds: Tuple[Any, ...], v: Any) -> Any:
+    """Replaces a number by where it falls among the thresholds it is compared
+    to, which fixes every gt/lt/eq against them. Other values (bool, None, NaN,
+    str...) are kept as they are."""
+    if v.__class__ is not int and v.__class__ is not float or v != v: return v
+    return (bisect_left(thresholds, v), bisect_right(thresholds, v))
+
+def collect_thresholds(node: Node,
+                       thresholds: Dict[Tuple[str, ...], Optional[set]]) -> None:
+    """Per path, the numbers it is compared to, or None if any condition on it
+    isn't a numeric gt/lt/eq (so its raw value has to be the key)."""
+    if isinstance(node, CompositeCondition):
+        for child in node.children: collect_thresholds(child, thresholds)
+        return
+    numeric = (
+        node.op in ("gt", "lt", "eq")
+        and node.value.__class__ in (int, float)
+        and node.value == node.value
+    )
+    seen = thresholds.setdefault(node.path, set())
+    if seen is None: return
+    if numeric: seen.add(node.value)
+    else: thresholds[node.path] = None
+
+def compile_keyer(rules: List[Rule]) -> Callable[[Dict[str, Any]], Tuple[Any, ...]]:
+    """Build `tx -> key`: the value of every path the rules read, numbers
+    bucketed by their thresholds. Transactions with equal keys get the same
+    decision."""
+    thresholds: Dict[Tuple[str, ...], Optional[set]] = {}
+    for rule in rules: collect_thresholds(rule.root, thresholds)
+    lines, names = render_loader(list(thresholds))
+    env: Dict[str, Any] = {"_bucket": bucket}
+    parts = []
+    for i, (path, values) in enumerate(thresholds.items()):
+        if values is None: parts.append(names[path]); continue
+        env[f"_t{i}"] = tuple(sorted(values))
+        parts.append(f"_bucket(_t{i}, {names[path]})")
+    lines.append(f"return ({''.join(part + ', ' for part in parts)})")
+    return compile_function("_key", "tx", lines, env, "<rule key>")
+
+def cache_decider(
+    decide: Callable[[Dict[str, Any]], Optional[Rule]],
+    key: Callable[[Dict[str, Any]], Tuple[Any, ...]],
+) -> Callable[[Dict[str, Any]], Optional[Rule]]:
+    cache: Dict[Tuple[Any, ...], Optional[Rule]] = {}
+    def _cached_decide(tx: Dict[str, Any]) -> Optional[Rule]:
+        k = key(tx)
+        try: return cache[k]
+        except KeyError: pass
+        except TypeError: return decide(tx)  # a dict/list value can't be hashed
+        if len(cache) >= DECISION_CACHE_SIZE: cache.clear()
+        chosen = cache[k] = decide(tx)
+        return chosen
+    _cached_decide.cache = cache  # for inspection (e.g. tests)
+    return _cached_decide
+
+# Rules are frozen, so re-loading an unchanged policy text can hand back the
+# same parsed tuple instead of parsing it again.
+@lru_cache(maxsize=16)
+def load_rules_from_yaml(yaml_text: str) -> Tuple[Rule, ...]:
+    # A first line that starts at column 0 means dedent() would be a no-op,
+    # so only pay for its scan when the text is actually indented.
+    if yaml_text[:1].isspace(): yaml_text = textwrap.dedent(yaml_text)
+    raw = yaml.load(yaml_text, Loader=SafeLoader)
     rules: List[Rule] = []
     for r in raw:
         when_spec = r.get("when") or {"field": "__always__", "op": "eq", "value": True}
@@ -73,41 +281,90 @@ def load_rules_from_yaml(yaml_text: str) -> List[Rule]:
             action=r["action"],
             priority=int(r.get("priority", 0)),
         ))
-    return rules
+    return tuple(rules)
 
 class PolicyEngine:
-    def __init__(self, rules: List[Rule]):
+    def __init__(self, rules: Sequence[Rule]):
         self.rules = rules
         self.action_rank = {"block": 2, "flag": 1, "allow": 0}
+        # Rules are fixed for the engine's lifetime, so evaluation order and the
+        # conflict-resolution key are computed once. The key packs
+        # (action rank, priority) into one int: rank in the high bits, the
+        # priority's dense rank below, so comparing keys is one int compare.
+        self.ordered = tuple(sorted(rules, key=lambda r: (-r.priority, r.name)))
+        dense = {p: i for i, p in enumerate(sorted({r.priority for r in rules}))}
+        # Every field path read by any rule, indexed by slot; resolved once per tx.
+        paths: Dict[Tuple[str, ...], None] = {}
+        for r in self.ordered: collect_paths(r.root, paths)
+        self.paths = list(paths)
+        refs = {p: f"ctx[{i}]" for i, p in enumerate(self.paths)}
+        self._load = compile_loader(self.paths)
+        # (key, name, rule, predicate), pre-bound so the trace loop does no
+        # attribute lookups per rule.
+        self._ranked = tuple(
+            (
+                (self.action_rank[r.action] << 32) | dense[r.priority],
+                r.name, r, compile_rule(r, refs),
+            )
+            for r in self.ordered
+        )
+        # In descending key order (stable, so earlier rules win ties) the first
+        # matching rule is exactly the one the trace loop's best-key scan picks.
+        by_key = sorted(self._ranked, key=lambda e: -e[0])
+        self._decide = compile_decider([r for _, _, r, _ in by_key])
+        if len(rules) >= CACHE_MIN_RULES:
+            self._decide = cache_decider(self._decide, compile_keyer(rules))
+
+    def evaluate(self, tx: Dict[str, Any], *,
+                 collect_trace: bool = False) -> Dict[str, Any]:
+        """With collect_trace, every rule is evaluated and the per-rule trace and
+        matched_rules are returned. Without it, the compiled rule set stops at
+        the winning rule and only the decision and rule name are returned."""
+        if not collect_trace:
+            chosen = self._decide(tx)
+            return {
+                "decision": chosen.action if chosen else "allow",
+                "rule": chosen.name if chosen else None,
+                "matched_rules": None,
+                "trace": None,
+            }
 
-    def evaluate(self, tx: Dict[str, Any]) -> Dict[str, Any]:
-        trace = []
-        matched = []
-        ordered = sorted(self.rules, key=lambda r: (-r.priority, r.name))
-
-        for rule in ordered:
-            result = rule.root.eval(tx)
-            trace.append({"rule": rule.name, "result": bool(result)})
-            if result: matched.append(rule)
-
-        if not matched:
-            decision, chosen = "allow", None
-        else:
-            chosen = max(matched, key=lambda r: (self.action_rank[r.action], r.priority))
-            decision = chosen.action
+        best_key, chosen = -1, None
+        trace, matched = [], []
+        ctx = self._load(tx)
+        for key, name, rule, pred in self._ranked:
+            result = bool(pred(ctx))
+            trace.append({"rule": name, "result": result})
+            if result:
+                matched.append(name)
+                # Strict >: on equal keys the earlier rule keeps the win.
+                if key > best_key: best_key, chosen = key, rule
 
         return {
-            "decision": decision,
+            "decision": chosen.action if chosen else "allow",
             "rule": chosen.name if chosen else None,
-            "matched_rules": [r.name for r in matched],
+            "matched_rules": matched,
             "trace": trace,
         }
 
+    def evaluate_batch(self, txs: List[Dict[str, Any]], *,
+                       collect_trace: bool = False) -> List[Dict[str, Any]]:
+        """Same results as evaluate() per tx. Without a trace the decider is
+        mapped over the whole batch in one pass, skipping a method call and
+        the collect_trace check per transaction."""
+        if collect_trace: return [self.evaluate(tx, collect_trace=True) for tx in txs]
+        return [
+            {"decision": chosen.action, "rule": chosen.name,
+             "matched_rules": None, "trace": None} if chosen
+            else {"decision": "allow", "rule": None, "matched_rules": None, "trace": None}
+            for chosen in map(self._decide, txs)
+        ]
+
 # ==========================================
 # 2. SERVER & DATA CONFIG
 # ==========================================
 
-DEFAULT_RULES = """
+DEFAULT_RULES = textwrap.dedent("""
 - name: block_unhosted_wallets
   when:
     field: originator.kyc
@@ -140,9 +397,31 @@ DEFAULT_RULES = """
   when: {}
   action: allow
   priority: 0
-"""
-
-app = FastAPI(title="ASPASIA Intelligence Layer", version="1.0.0")
+""").strip()
+
+# Run through both evaluate() paths before an engine takes traffic, so the
+# first real request doesn't pay the first-call cost.
+SAMPLE_TX = {
+    "id": "warmup", "originator": {"kyc": True}, "beneficiary": {},
+    "amount": 0, "currency": "EUR", "context": "Standard",
+}
+
+def build_engine(yaml_text: str) -> PolicyEngine:
+    engine = PolicyEngine(load_rules_from_yaml(yaml_text))
+    engine.evaluate(SAMPLE_TX)
+    engine.evaluate(SAMPLE_TX, collect_trace=True)
+    return engine
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Compiles the policy engine when the server starts rather than at import,
+    and keeps it on app.state for the handlers. The engine is only published,
+    in one assignment, once it is built and warmed."""
+    app.state.engine = build_engine(DEFAULT_RULES)
+    yield
+
+# Responses are serialized from their response_model by pydantic-core.
+app = FastAPI(title="ASPASIA Intelligence Layer", version="1.0.0", lifespan=lifespan)
 
 class TransactionRequest(BaseModel):
     id: str
@@ -152,278 +431,179 @@ class TransactionRequest(BaseModel):
     currency: str
     context: Optional[str] = "Standard"
 
+# The screening endpoints read the raw body and let pydantic-core decode and
+# validate it in one pass, instead of FastAPI's JSON decode followed by a
+# separate validation of the resulting dicts.
+TX_ADAPTER = TypeAdapter(TransactionRequest)
+TX_BATCH_ADAPTER = TypeAdapter(List[TransactionRequest])
+
+def is_json_content(content_type: Optional[str]) -> bool:
+    """FastAPI's test for a JSON body: application/json or application/*+json.
+    Anything else, or no Content-Type at all, isn't decoded, which keeps
+    cross-site "simple" POSTs (text/plain, forms) from passing validation."""
+    if not content_type: return False
+    media = content_type.split(";", 1)[0].strip().lower()
+    return media == "application/json" or (
+        media.startswith("application/") and media.endswith("+json")
+    )
+
+def parse_body(adapter: TypeAdapter, body: bytes,
+               content_type: Optional[str]) -> Any:
+    """Decodes and validates a raw body with the errors FastAPI raises for a
+    declared JSON body: 422 "missing" for an empty body, 422 when the body isn't
+    sent as JSON (its raw bytes are validated, and fail), 422 "JSON decode
+    error" when it doesn't parse and 400 when it isn't text."""
+    if not body:
+        raise RequestValidationError(
+            [{"type": "missing", "loc": ("body",), "msg": "Field required",
+              "input": None}]
+        )
+    value: Any = body
+    if is_json_content(content_type):
+        try: return adapter.validate_json(body)
+        except ValidationError: pass
+        # Only on the error path: redo FastAPI's stdlib decode and validation,
+        # so a rejected body gets exactly the 422 a declared body would.
+        try: value = json.loads(body)
+        except json.JSONDecodeError as d:
+            raise RequestValidationError([{
+                "type": "json_invalid", "loc": ("body", d.pos),
+                "msg": "JSON decode error", "input": {}, "ctx": {"error": d.msg},
+            }], body=d.doc)
+        except ValueError:
+            raise HTTPException(
+                status_code=400, detail="There was an error parsing the body"
+            )
+    try: return adapter.validate_python(value, from_attributes=True)
+    except ValidationError as e:
+        raise RequestValidationError([
+            {**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)
+        ], body=value)
+
+def json_body(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """openapi_extra documenting a body the handler reads itself."""
+    content = {"application/json": {"schema": schema}}
+    return {"requestBody": {"required": True, "content": content}}
+
 class PolicyResponse(BaseModel):
     decision: str
     rule_applied: Optional[str]
     trace_id: str
-    trace: List[Dict[str, Any]]
+    trace: Optional[List[Dict[str, Any]]] = None
 
-# Init Engine
-rules_objects = load_rules_from_yaml(DEFAULT_RULES)
-engine = PolicyEngine(rules_objects)
-STATS = {"total_processed": 0, "decisions": {"BLOCK": 0, "FLAG": 0, "ALLOW": 0}}
+class StatsResponse(BaseModel):
+    total_processed: int
+    decisions: Dict[str, int]
 
-# ==========================================
-# 3. HTML FRONTEND (Single File)
-# ==========================================
-# This HTML replaces the Streamlit UI. It talks to the API below.
-
-HTML_TEMPLATE = """
-<!DOCTYPE html>
-<html>
-<head>
-    <title>ASPASIA | Protocol-Embedded Policy</title>
-    <meta name="viewport" content="width=device-width, initial-scale=1">
-    <script src="https://cdn.tailwindcss.com"></script>
-    <style>
-        body { font-family: 'Inter', sans-serif; background: #f8fafc; }
-        .sidebar { background: #1e293b; color: white; min-height: 100vh; }
-        .nav-link { display: block; padding: 12px 20px; color: #94a3b8; text-decoration: none; cursor: pointer; }
-        .nav-link:hover, .nav-link.active { background: #0f172a; color: white; border-left: 3px solid #0ea5e9; }
-        .code-block { background: #1e293b; color: #a5b4fc; padding: 15px; border-radius: 6px; font-family: monospace; overflow-x: auto; }
-        .badge { padding: 4px 8px; border-radius: 4px; font-size: 0.8em; font-weight: bold; }
-        .badge-block { background: #fee2e2; color: #991b1b; }
-        .badge-flag { background: #fef3c7; color: #92400e; }
-        .badge-allow { background: #dcfce7; color: #166534; }
-    </style>
-    <script>
-        // Data for scenarios
-        const scenarios = {
-            "tx_high": { "id": "tx_high", "originator": {"kyc": true}, "beneficiary": {}, "amount": 250000, "currency": "EUR" },
-            "tx_norm": { "id": "tx_norm", "originator": {"kyc": true}, "beneficiary": {}, "amount": 15000, "currency": "EUR" },
-            "tx_bad":  { "id": "tx_bad",  "originator": {"kyc": false}, "beneficiary": {}, "amount": 5000,  "currency": "EUR", "context": "Virtual_Asset_Transfer" }
-        };
-
-        function loadScenario(key) {
-            document.getElementById('txInput').value = JSON.stringify(scenarios[key], null, 2);
-        }
+class Stats:
+    """Running decision counters; flat integer slots instead of nested dicts.
+    The total is derived in snapshot(), so recording a decision is a single
+    increment. Handlers run on the event loop, so increments never interleave."""
+    __slots__ = ("BLOCK", "FLAG", "ALLOW")
 
-        async function runCheck() {
-            const raw = document.getElementById('txInput').value;
-            try {
-                const tx = JSON.parse(raw);
-                const res = await fetch('/enforce', {
-                    method: 'POST',
-                    headers: {'Content-Type': 'application/json'},
-                    body: raw
-                });
-                const data = await res.json();
-                
-                // Visual Updates
-                const statusDiv = document.getElementById('statusResult');
-                let badgeClass = data.decision === 'BLOCK' ? 'badge-block' : (data.decision === 'FLAG' ? 'badge-flag' : 'badge-allow');
-                statusDiv.innerHTML = `<span class="badge ${badgeClass} text-xl">DECISION: ${data.decision}</span>`;
-                
-                document.getElementById('ruleResult').innerText = data.rule_applied || "None";
-                document.getElementById('traceResult').innerText = JSON.stringify(data.trace, null, 2);
-                
-                // Refresh Stats
-                loadStats();
-                
-            } catch (e) {
-                alert("Invalid JSON or API Error: " + e);
-            }
-        }
+    def __init__(self):
+        self.BLOCK = self.FLAG = self.ALLOW = 0
 
-        async function loadStats() {
-            const res = await fetch('/stats');
-            const data = await res.json();
-            document.getElementById('statTotal').innerText = data.total_processed;
-            document.getElementById('statBlock').innerText = data.decisions.BLOCK;
-        }
+    def record(self, decision_key: str) -> None:
+        setattr(self, decision_key, getattr(self, decision_key) + 1)
 
-        function showPage(id) {
-            document.querySelectorAll('.page').forEach(el => el.style.display = 'none');
-            document.getElementById(id).style.display = 'block';
-            document.querySelectorAll('.nav-link').forEach(el => el.classList.remove('active'));
-            event.target.classList.add('active');
+    def record_batch(self, decision_keys: List[str]) -> None:
+        """One update per distinct decision rather than one per transaction."""
+        for decision_key, n in Counter(decision_keys).items():
+            setattr(self, decision_key, getattr(self, decision_key) + n)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "total_processed": self.BLOCK + self.FLAG + self.ALLOW,
+            "decisions": {"BLOCK": self.BLOCK, "FLAG": self.FLAG, "ALLOW": self.ALLOW},
         }
-        
-        window.onload = loadStats;
-    </script>
-</head>
-<body class="flex">
-
-    <!-- Sidebar -->
-    <div class="sidebar w-64 flex-none hidden md:block">
-        <div class="p-6">
-            <h1 class="text-xl font-bold tracking-wider">ASPASIA <span class="text-sky-400 text-xs">v1.0</span></h1>
-            <p class="text-xs text-slate-400 mt-1">Intelligence Layer</p>
-        </div>
-        <nav>
-            <a onclick="showPage('page-sim')" class="nav-link active">🚀 Live Simulator</a>
-            <a onclick="showPage('page-ast')" class="nav-link">🧠 AST vs. Agents</a>
-            <a onclick="showPage('page-conflict')" class="nav-link">⚔️ Conflict Resolution</a>
-            <a href="/docs" target="_blank" class="nav-link">🔌 API Docs (Swagger)</a>
-        </nav>
-        <div class="p-6 mt-10">
-            <div class="text-xs text-slate-500 uppercase font-bold">Live Stats</div>
-            <div class="mt-2 text-sm">Processed: <span id="statTotal" class="text-white">0</span></div>
-            <div class="text-sm">Blocked: <span id="statBlock" class="text-red-400">0</span></div>
-        </div>
-    </div>
-
-    <!-- Main Content -->
-    <div class="flex-1 p-8 h-screen overflow-y-auto">
-        
-        <!-- PAGE 1: SIMULATOR -->
-        <div id="page-sim" class="page">
-            <h2 class="text-3xl font-bold text-slate-800 mb-6">Transaction Simulator</h2>
-            <p class="text-slate-600 mb-8">Test the <strong>Ex-Ante Enforcement</strong> engine. Send a transaction JSON to the API and see the deterministic result instantly.</p>
-
-            <div class="grid grid-cols-1 lg:grid-cols-2 gap-8">
-                <!-- Input Column -->
-                <div class="bg-white p-6 rounded-xl shadow-sm border border-slate-200">
-                    <div class="flex justify-between items-center mb-4">
-                        <h3 class="font-bold text-slate-700">1. Transaction Payload</h3>
-                        <div class="space-x-2">
-                            <button onclick="loadScenario('tx_norm')" class="text-xs bg-slate-100 hover:bg-slate-200 px-2 py-1 rounded">Normal</button>
-                            <button onclick="loadScenario('tx_high')" class="text-xs bg-slate-100 hover:bg-slate-200 px-2 py-1 rounded">High Val</button>
-                            <button onclick="loadScenario('tx_bad')" class="text-xs bg-red-50 hover:bg-red-100 text-red-600 px-2 py-1 rounded">Unhosted</button>
-                        </div>
-                    </div>
-                    <textarea id="txInput" class="w-full h-64 font-mono text-sm p-4 bg-slate-50 border rounded-lg focus:ring-2 ring-sky-500 outline-none">
-{
-  "id": "tx_demo_01",
-  "originator": {
-    "kyc": true,
-    "id": "BANK_001"
-  },
-  "beneficiary": {},
-  "amount": 15000,
-  "currency": "EUR"
-}</textarea>
-                    <button onclick="runCheck()" class="mt-4 w-full bg-sky-600 hover:bg-sky-700 text-white font-bold py-3 rounded-lg transition">
-                        POST /enforce (Run Check)
-                    </button>
-                </div>
-
-                <!-- Output Column -->
-                <div class="bg-white p-6 rounded-xl shadow-sm border border-slate-200">
-                    <h3 class="font-bold text-slate-700 mb-4">2. API Response</h3>
-                    
-                    <div class="mb-6 p-4 bg-slate-50 rounded-lg border border-slate-100 flex justify-between items-center">
-                        <div>
-                            <div class="text-xs text-slate-500 uppercase">Status</div>
-                            <div id="statusResult" class="mt-1"><span class="text-slate-400">Waiting...</span></div>
-                        </div>
-                        <div class="text-right">
-                            <div class="text-xs text-slate-500 uppercase">Winning Rule</div>
-                            <div id="ruleResult" class="font-mono text-sm text-slate-700 mt-1">-</div>
-                        </div>
-                    </div>
-
-                    <div class="text-xs text-slate-500 uppercase mb-2">Cryptographic Audit Trace</div>
-                    <div id="traceResult" class="code-block h-64 text-xs">
-// The JSON audit log will appear here...
-                    </div>
-                </div>
-            </div>
-        </div>
-
-        <!-- PAGE 2: AST DESIGN -->
-        <div id="page-ast" class="page" style="display:none;">
-            <h2 class="text-3xl font-bold text-slate-800 mb-6">Why ASTs beat Agents</h2>
-            <div class="bg-white p-8 rounded-xl shadow-sm border border-slate-200">
-                <div class="grid grid-cols-2 gap-8 mb-8">
-                    <div class="p-4 bg-red-50 rounded-lg border border-red-100">
-                        <h4 class="font-bold text-red-800 mb-2">❌ Stochastic Agents (LLMs)</h4>
-                        <ul class="list-disc list-inside text-sm text-red-700 space-y-2">
-                            <li><strong>Probabilistic:</strong> Ask twice, get different answers.</li>
-                            <li><strong>Hallucinations:</strong> Can invent rules.</li>
-                            <li><strong>Black Box:</strong> Hard to audit specific logic paths.</li>
-                        </ul>
-                    </div>
-                    <div class="p-4 bg-green-50 rounded-lg border border-green-100">
-                        <h4 class="font-bold text-green-800 mb-2">✅ ASPASIA (Deterministic AST)</h4>
-                        <ul class="list-disc list-inside text-sm text-green-700 space-y-2">
-                            <li><strong>Deterministic:</strong> 100% reproducible results.</li>
-                            <li><strong>Strict Liability:</strong> Code executes exactly as written.</li>
-                            <li><strong>Traversable:</strong> We walk the tree and record every step.</li>
-                        </ul>
-                    </div>
-                </div>
-                <h3 class="font-bold text-slate-700 mb-4">The Recursive Logic Tree</h3>
-                <pre class="code-block">
-@dataclass
-class CompositeCondition:
-    mode: Literal["all", "any"]
-    children: List["Node"]  # <-- Recursive Definition
-
-    def eval(self, tx):
-        # We walk this tree recursively
-        if self.mode == "all": return all(c.eval(tx) for c in self.children)
-</pre>
-            </div>
-        </div>
-
-        <!-- PAGE 3: CONFLICT RESOLUTION -->
-        <div id="page-conflict" class="page" style="display:none;">
-            <h2 class="text-3xl font-bold text-slate-800 mb-6">Explicit Conflict Resolution</h2>
-            <div class="bg-white p-8 rounded-xl shadow-sm border border-slate-200">
-                <p class="text-lg text-slate-600 mb-6">
-                    In banking, rules collide. A "VIP Allow" rule might conflict with a "Sanctions Block".
-                    ASPASIA solves this via <strong>Tuple Sorting</strong>.
-                </p>
-                
-                <div class="p-6 bg-slate-50 border border-slate-200 rounded-lg mb-6">
-                    <h4 class="font-mono text-sm text-slate-500 mb-2">ALGORITHM</h4>
-                    <pre class="text-sm font-mono text-slate-700">chosen = max(matched, key=lambda r: (self.action_rank[r.action], r.priority))</pre>
-                </div>
-
-                <h3 class="font-bold text-slate-700 mb-4">The Hierarchy of Severity</h3>
-                <div class="space-y-3">
-                    <div class="flex items-center p-3 bg-red-50 border border-red-100 rounded">
-                        <span class="badge badge-block mr-4">BLOCK (Rank 2)</span>
-                        <span class="text-sm text-red-800">The "Nuclear Option". Overrides everything.</span>
-                    </div>
-                    <div class="flex items-center p-3 bg-amber-50 border border-amber-100 rounded">
-                        <span class="badge badge-flag mr-4">FLAG (Rank 1)</span>
-                        <span class="text-sm text-amber-800">Overrides 'Allow', but yields to 'Block'.</span>
-                    </div>
-                    <div class="flex items-center p-3 bg-green-50 border border-green-100 rounded">
-                        <span class="badge badge-allow mr-4">ALLOW (Rank 0)</span>
-                        <span class="text-sm text-green-800">The default state. Weakest priority.</span>
-                    </div>
-                </div>
-            </div>
-        </div>
-
-    </div>
-</body>
-</html>
-"""
+
+STATS = Stats()
 
 # ==========================================
-# 4. API ENDPOINTS
+# 3. HTML FRONTEND (Single File)
 # ==========================================
+# static/index.html replaces the Streamlit UI. It talks to the API below and
+# is served from disk so Starlette handles Content-Length/ETag/Last-Modified.
 
-@app.get("/", response_class=HTMLResponse)
-def get_dashboard():
-    """Serves the Single-Page Application (SPA) dashboard."""
-    return HTML_TEMPLATE
+STATIC_DIR = Path(__file__).parent / "static"
+app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 
-@app.get("/stats")
-def live_stats():
-    return STATS
+# ==========================================
+# 4. API ENDPOINTS
+# ==========================================
 
-@app.post("/enforce", response_model=PolicyResponse)
-def enforce_policy(tx: TransactionRequest):
-    tx_data = tx.dict()
+def policy_response(tx: TransactionRequest, result: Dict[str, Any]) -> Dict[str, Any]:
+    """Shapes an engine result as a PolicyResponse."""
+    return {
+        "decision": result["decision"].upper(),
+        "rule_applied": result["rule"],
+        "trace_id": f"trace_{tx.id}_secure",
+        "trace": result["trace"]
+    }
+
+@app.get("/", response_class=FileResponse)
+async def get_dashboard():
+    """Serves the Single-Page Application (SPA) dashboard."""
+    return FileResponse(STATIC_DIR / "index.html")
+
+@app.get("/stats", response_model=StatsResponse)
+async def live_stats():
+    return STATS.snapshot()
+
+@app.post("/enforce", response_model=PolicyResponse,
+          openapi_extra=json_body(TransactionRequest.model_json_schema()))
+async def enforce_policy(request: Request, trace: bool = False):
+    """Screens one transaction. Pass ?trace=1 for the full per-rule trace."""
+    # evaluate() is short, non-blocking CPU work, so the handlers are coroutines
+    # and run on the event loop instead of taking a threadpool hop per request.
+    content_type = request.headers.get("content-type")
+    tx = parse_body(TX_ADAPTER, await request.body(), content_type)
+    # The engine only reads fields, so hand it the model's own field dict rather
+    # than a recursive copy from tx.dict().
+    tx_data = tx.__dict__
     try:
         # Run the Engine
-        result = engine.evaluate(tx_data)
+        result = request.app.state.engine.evaluate(tx_data, collect_trace=trace)
         
-        # Update Stats
-        decision_key = result["decision"].upper()
-        STATS["total_processed"] += 1
-        STATS["decisions"][decision_key] += 1
+        response = policy_response(tx, result)
+        STATS.record(response["decision"])
+        return response
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        return {
-            "decision": decision_key,
-            "rule_applied": result["rule"],
-            "trace_id": f"trace_{tx.id}_secure",
-            "trace": result["trace"]
-        }
+def screen_batch(engine: PolicyEngine, body: bytes, content_type: Optional[str],
+                 trace: bool) -> List[Dict[str, Any]]:
+    """Validates and screens a whole batch body."""
+    txs = parse_body(TX_BATCH_ADAPTER, body, content_type)
+    results = engine.evaluate_batch([tx.__dict__ for tx in txs], collect_trace=trace)
+    return [policy_response(tx, result) for tx, result in zip(txs, results)]
+
+TX_BATCH_SCHEMA = {"type": "array", "items": TransactionRequest.model_json_schema()}
+
+@app.post("/enforce_batch", response_model=List[PolicyResponse],
+          openapi_extra=json_body(TX_BATCH_SCHEMA))
+async def enforce_batch(request: Request, trace: bool = False):
+    """Screens a list of transactions in one request; results keep input order."""
+    body = await request.body()
+    try:
+        # A batch can be any size, so unlike /enforce its validation and
+        # evaluation run in the threadpool instead of stalling the event loop.
+        responses = await run_in_threadpool(
+            screen_batch, request.app.state.engine, body,
+            request.headers.get("content-type"), trace,
+        )
+    except (RequestValidationError, HTTPException):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    # Back on the event loop, so this can't interleave with STATS.record().
+    STATS.record_batch([response["decision"] for response in responses])
+    return responses
+
+if __name__ == "__main__":
+    import uvicorn
+    # uvicorn already uses uvloop and httptools when they're installed
+    # (uvicorn[standard]); see the README. Worker count comes from
+    # WEB_CONCURRENCY; STATS is per worker process.
+    uvicorn.run("api_server:app", host="127.0.0.1", port=8000)
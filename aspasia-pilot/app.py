@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Any, Dict, List, Literal, Union
+from typing import Any, Callable, Dict, List, Literal, Optional, Tuple, Union
 
 import json
 import textwrap
@@ -9,6 +9,11 @@ import textwrap
 import streamlit as st
 import yaml
 
+try:  # libyaml-backed parser; PyYAML wheels normally ship it
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 
 # ----------------- Demo rules & transactions ----------------- #
 RULE_DESCRIPTIONS = {
@@ -123,53 +128,24 @@ TXS = {
 Decision = Literal["allow", "block", "flag"]
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Condition:
     field: str
     op: str
     value: Any
+    path: Tuple[str, ...]
 
-    def _get_nested(self, tx: Dict[str, Any]) -> Any:
-        current: Any = tx
-        for part in self.field.split("."):
-            if not isinstance(current, dict) or part not in current:
-                return None
-            current = current[part]
-        return current
-
-    def eval(self, tx: Dict[str, Any]) -> bool:
-        v = self._get_nested(tx)
-        if v is None:
-            return False
-
-        if self.op == "gt":
-            return v > self.value
-        if self.op == "lt":
-            return v < self.value
-        if self.op == "eq":
-            return v == self.value
-        if self.op == "in":
-            return v in self.value
 
-        raise ValueError(f"Unknown operator: {self.op!r}")
-
-
-@dataclass
+@dataclass(frozen=True, slots=True)
 class CompositeCondition:
     mode: Literal["all", "any"]
-    children: List["Node"]
-
-    def eval(self, tx: Dict[str, Any]) -> bool:
-        if self.mode == "all":
-            return all(child.eval(tx) for child in self.children)
-        else:
-            return any(child.eval(tx) for child in self.children)
+    children: Tuple["Node", ...]
 
 
 Node = Union[Condition, CompositeCondition]
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Rule:
     name: str
     root: Node
@@ -181,18 +157,144 @@ def build_node(spec: Dict[str, Any]) -> Node:
     if "all" in spec or "any" in spec:
         mode = "all" if "all" in spec else "any"
         children_specs = spec[mode]
-        children = [build_node(child) for child in children_specs]
-        return CompositeCondition(mode=mode, children=children)
+
+        # Flatten while building: same-mode composites are spliced into their
+        # parent and a single child stands in for its composite, so nesting in
+        # the YAML costs no extra parentheses in compiled code.
+        children: List[Node] = []
+        for child in map(build_node, children_specs):
+            if isinstance(child, CompositeCondition) and child.mode == mode:
+                children.extend(child.children)
+            else:
+                children.append(child)
+        if len(children) == 1:
+            return children[0]
+
+        return CompositeCondition(mode=mode, children=tuple(children))
+
+    op = spec["op"]
+    value = spec["value"]
+    if op == "in" and isinstance(value, list):
+        # Set membership is O(1); lists holding unhashable items stay lists.
+        try:
+            value = frozenset(value)
+        except TypeError:
+            pass
 
     return Condition(
         field=spec["field"],
-        op=spec["op"],
-        value=spec["value"],
+        op=op,
+        value=value,
+        path=tuple(spec["field"].split(".")),
     )
 
 
+# Rules are compiled once to flat Python functions so evaluation skips the
+# recursive tree walk. Rule values are bound into the function's namespace
+# by name rather than repr()'d, so any YAML scalar (e.g. .inf) round-trips.
+OP_TEMPLATES = {
+    "gt": "{v} > {c}",
+    "lt": "{v} < {c}",
+    "eq": "{v} == {c}",
+    "in": "{v} in {c}",
+}
+
+
+def collect_paths(node: Node, paths: Dict[Tuple[str, ...], None]) -> None:
+    if isinstance(node, CompositeCondition):
+        for child in node.children:
+            collect_paths(child, paths)
+    else:
+        paths.setdefault(node.path)
+
+
+def render_node(
+    node: Node, env: Dict[str, Any], refs: Dict[Tuple[str, ...], str]
+) -> str:
+    if isinstance(node, CompositeCondition):
+        if not node.children:
+            return "True" if node.mode == "all" else "False"
+        joiner = " and " if node.mode == "all" else " or "
+        rendered = (render_node(child, env, refs) for child in node.children)
+        return "(" + joiner.join(rendered) + ")"
+
+    if node.op not in OP_TEMPLATES:
+        raise ValueError(f"Unknown operator: {node.op!r}")
+    const = f"_c{len(env)}"
+    env[const] = node.value
+
+    # refs maps each path to the expression holding its already-resolved value
+    # (see render_loader). A missing or None value makes the condition False.
+    ref = refs[node.path]
+    if ref.isidentifier():
+        var = ref
+        steps = [f"{ref} is not None"]
+    else:
+        var = f"{const}_v"
+        steps = [f"({var} := {ref}) is not None"]
+    if isinstance(node.value, frozenset):
+        steps.append(f"{var}.__hash__ is not None")
+    steps.append(OP_TEMPLATES[node.op].format(v=var, c=const))
+    return "(" + " and ".join(steps) + ")"
+
+
+def render_loader(
+    paths: List[Tuple[str, ...]]
+) -> Tuple[List[str], Dict[Tuple[str, ...], str]]:
+    """Statements that resolve every path from `tx` into a local, walking each
+    shared prefix (e.g. `originator`) once. A path through a non-dict
+    resolves to None."""
+    names: Dict[Tuple[str, ...], str] = {(): "tx"}
+    lines: List[str] = []
+    for path in paths:
+        for depth in range(1, len(path) + 1):
+            prefix = path[:depth]
+            if prefix in names:
+                continue
+            parent = names[prefix[:-1]]
+            var = f"_p{len(names)}"
+            if depth == 1:
+                lines.append(f"{var} = tx.get({prefix[-1]!r})")
+            else:
+                lines.append(
+                    f"{var} = {parent}.get({prefix[-1]!r})"
+                    f" if isinstance({parent}, dict) else None"
+                )
+            names[prefix] = var
+    return lines, names
+
+
+def compile_function(
+    name: str, args: str, lines: List[str], env: Dict[str, Any], filename: str
+) -> Callable:
+    src = f"def {name}({args}):\n" + "".join(f"    {line}\n" for line in lines)
+    exec(compile(src, filename, "exec"), env)
+    return env[name]
+
+
+def compile_rule(
+    rule: Rule, refs: Dict[Tuple[str, ...], str]
+) -> Callable[[Tuple[Any, ...]], bool]:
+    env: Dict[str, Any] = {}
+    body = [f"return {render_node(rule.root, env, refs)}"]
+    return compile_function("_rule", "ctx", body, env, f"<rule {rule.name}>")
+
+
+def compile_loader(
+    paths: List[Tuple[str, ...]]
+) -> Callable[[Dict[str, Any]], Tuple[Any, ...]]:
+    """Build `tx -> ctx`: one tuple holding the value of every path."""
+    lines, names = render_loader(paths)
+    lines.append(f"return ({''.join(names[p] + ', ' for p in paths)})")
+    return compile_function("_load", "tx", lines, {}, "<rule paths>")
+
+
 def load_rules_from_yaml(yaml_text: str) -> List[Rule]:
-    raw = yaml.safe_load(textwrap.dedent(yaml_text))
+    # A first line that starts at column 0 means dedent() would be a no-op,
+    # so only pay for its scan when the text is actually indented.
+    if yaml_text[:1].isspace():
+        yaml_text = textwrap.dedent(yaml_text)
+    raw = yaml.load(yaml_text, Loader=SafeLoader)
 
     rules: List[Rule] = []
     for r in raw:
@@ -216,38 +318,70 @@ class PolicyEngine:
         self.rules = rules
         self.action_rank = {"block": 2, "flag": 1, "allow": 0}
 
+        # Rules are fixed for the engine's lifetime, so evaluation order and the
+        # conflict-resolution key are computed once. The key packs
+        # (action rank, priority) into one int: rank in the high bits, the
+        # priority's dense rank below, so comparing keys is one int compare.
+        self.ordered = tuple(sorted(rules, key=lambda r: (-r.priority, r.name)))
+        dense = {p: i for i, p in enumerate(sorted({r.priority for r in rules}))}
+
+        # Every field path read by any rule, indexed by slot; resolved once per tx.
+        paths: Dict[Tuple[str, ...], None] = {}
+        for r in self.ordered:
+            collect_paths(r.root, paths)
+        self.paths = list(paths)
+        refs = {p: f"ctx[{i}]" for i, p in enumerate(self.paths)}
+        self._load = compile_loader(self.paths)
+
+        # (key, name, rule, predicate), pre-bound so the trace loop does no
+        # attribute lookups per rule.
+        self._ranked = tuple(
+            (
+                (self.action_rank[r.action] << 32) | dense[r.priority],
+                r.name,
+                r,
+                compile_rule(r, refs),
+            )
+            for r in self.ordered
+        )
+
     def evaluate(self, tx: Dict[str, Any]) -> Dict[str, Any]:
+        best_key = -1
+        chosen: Optional[Rule] = None
         trace: List[Dict[str, Any]] = []
-        matched: List[Rule] = []
+        matched: List[str] = []
 
-        ordered = sorted(self.rules, key=lambda r: (-r.priority, r.name))
-
-        for rule in ordered:
-            result = rule.root.eval(tx)
-            trace.append({"rule": rule.name, "result": bool(result)})
+        ctx = self._load(tx)
+        for key, name, rule, pred in self._ranked:
+            result = bool(pred(ctx))
+            trace.append({"rule": name, "result": result})
             if result:
-                matched.append(rule)
-
-        if not matched:
-            decision: Decision = "allow"
-            chosen = None
-        else:
-            chosen = max(
-                matched,
-                key=lambda r: (self.action_rank[r.action], r.priority),
-            )
-            decision = chosen.action
+                matched.append(name)
+                # Strict >: on equal keys the earlier rule keeps the win.
+                if key > best_key:
+                    best_key, chosen = key, rule
+
+        decision: Decision = chosen.action if chosen else "allow"
 
         return {
             "decision": decision,
             "rule": chosen.name if chosen else None,
-            "matched_rules": [r.name for r in matched],
+            "matched_rules": matched,
             "trace": trace,
         }
 
 
 # ----------------- Streamlit UI ----------------- #
 
+# Streamlit re-executes this script on every interaction, so a module-level
+# functools.lru_cache would be rebuilt each run; cache_resource persists
+# across reruns. Keyed on the YAML text, so unchanged rules skip both the
+# YAML parse and rule compilation.
+@st.cache_resource(max_entries=16)
+def get_engine(rules_text: str) -> PolicyEngine:
+    return PolicyEngine(load_rules_from_yaml(rules_text))
+
+
 st.set_page_config(
     page_title="Encoding Regulation – Minimal Policy Engine",
     layout="wide",
@@ -268,7 +402,7 @@ with col_rules:
         value=RULES_YAML_DEFAULT,
         height=350,
         label_visibility="collapsed",
-        help="Edit policy rules here; the engine will reparse them on each run.",
+        help="Edit policy rules here; the engine reparses them whenever they change.",
     )
 
     st.caption(
@@ -296,8 +430,7 @@ with col_tx:
 
     if st.button("Evaluate", type="primary"):
         try:
-            rules = load_rules_from_yaml(rules_text)
-            engine = PolicyEngine(rules)
+            engine = get_engine(rules_text)
             result = engine.evaluate(tx)
 
             # 1. Show the Decision
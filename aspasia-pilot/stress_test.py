@@ -1,66 +1,113 @@
 import requests
 import time
 import random
-import uuid
+import os
 import statistics
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+try:  # orjson decodes the responses much faster than requests' stdlib json
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
 # Configuration
 API_URL = "http://127.0.0.1:8000/enforce"
+BATCH_URL = "http://127.0.0.1:8000/enforce_batch"
 NUM_TRANSACTIONS = 100  # How many to simulate
+BATCH_SIZE = 1  # >1 groups transactions into POST /enforce_batch calls
+MAX_WORKERS = 64  # Concurrent requests in flight
+
+# One keep-alive session so each request reuses a pooled connection
+# instead of paying a fresh TCP handshake
+session = requests.Session()
+session.mount("http://", HTTPAdapter(pool_connections=10, pool_maxsize=MAX_WORKERS))
 
 print(f"--- STARTING ASPASIA STRESS TEST ({NUM_TRANSACTIONS} txs) ---")
-print(f"Targeting Intelligence Layer at: {API_URL}\n")
+print(f"Targeting Intelligence Layer at: {API_URL if BATCH_SIZE == 1 else BATCH_URL}\n")
 
 latencies = []
 decisions = {"BLOCK": 0, "FLAG": 0, "ALLOW": 0}
 
-start_time = time.time()
 
-for i in range(NUM_TRANSACTIONS):
-    # 1. Randomize the Data (Simulate real traffic)
+# Only id, kyc and amount vary, so each body is filled into a pre-encoded
+# template instead of building a dict for requests to json.dumps
+PAYLOAD_TEMPLATE = b'{"id":"tx_%s","originator":{"kyc":%s,"id":"bank_gen"},"beneficiary":{},"amount":%d,"currency":"EUR"}'
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+def make_payload(tx_id):
+    # Randomize the Data (Simulate real traffic)
     is_sketchy = random.random() < 0.2  # 20% chance of no KYC
     is_high_value = random.random() < 0.3 # 30% chance of > 100k
-    
+
     amount = 250000 if is_high_value else random.randint(100, 90000)
-    kyc_status = False if is_sketchy else True
-    
-    payload = {
-        "id": f"tx_{uuid.uuid4().hex[:8]}",
-        "originator": {"kyc": kyc_status, "id": "bank_gen"},
-        "beneficiary": {},
-        "amount": amount,
-        "currency": "EUR"
-    }
-
-    # 2. Measure the API Call (The "Speed" Promise)
-    req_start = time.time()
+    kyc_status = b"false" if is_sketchy else b"true"
+
+    return PAYLOAD_TEMPLATE % (tx_id.encode(), kyc_status, amount)
+
+
+def send(body):
+    # Returns (latency_ms, decisions), or None if the request failed
+    req_start = time.perf_counter_ns()
     try:
-        response = requests.post(API_URL, json=payload)
-        latency = (time.time() - req_start) * 1000 # Convert to ms
-        latencies.append(latency)
-        
-        # 3. Record the Decision
-        data = response.json()
-        decision = data["decision"]
+        if BATCH_SIZE == 1:
+            response = session.post(API_URL, data=body, headers=JSON_HEADERS)
+            results = [json_loads(response.content)]
+        else:
+            response = session.post(BATCH_URL, data=body, headers=JSON_HEADERS)
+            results = json_loads(response.content)
+        latency = (time.perf_counter_ns() - req_start) / 1e6 # Convert to ms
+        return latency, [data["decision"] for data in results]
+    except Exception as e:
+        return None
+
+
+# 1. Build every request body up front, drawing all the 8-hex-digit IDs
+# from a single urandom call
+raw_ids = os.urandom(4 * NUM_TRANSACTIONS)
+ids = [raw_ids[i:i + 4].hex() for i in range(0, 4 * NUM_TRANSACTIONS, 4)]
+if BATCH_SIZE == 1:
+    bodies = [make_payload(tx_id) for tx_id in ids]
+else:
+    bodies = [
+        b"[" + b",".join(make_payload(tx_id) for tx_id in ids[start:start + BATCH_SIZE]) + b"]"
+        for start in range(0, NUM_TRANSACTIONS, BATCH_SIZE)
+    ]
+
+# 2. Measure the API Calls (The "Speed" Promise)
+start_time = time.perf_counter_ns()
+with ThreadPoolExecutor(MAX_WORKERS) as ex:
+    outcomes = list(ex.map(send, bodies))
+total_time = (time.perf_counter_ns() - start_time) / 1e9 # Convert to seconds
+
+# 3. Record the Decisions (after the run, so workers never contend on stdout)
+symbols = []
+for outcome in outcomes:
+    if outcome is None:
+        symbols.append("X")
+        continue
+    latency, batch_decisions = outcome
+    latencies.append(latency)
+    for decision in batch_decisions:
         decisions[decision] += 1
-        
+
         # Visual feedback (dots)
-        symbol = "✅" if decision == "ALLOW" else ("⛔" if decision == "BLOCK" else "🚩")
-        print(symbol, end="", flush=True)
-        
-    except Exception as e:
-        print("X", end="", flush=True)
+        symbols.append("✅" if decision == "ALLOW" else ("⛔" if decision == "BLOCK" else "🚩"))
 
-total_time = time.time() - start_time
+# One write for the whole run instead of one per transaction
+print("".join(symbols), end="")
 
 print(f"\n\n--- PERFORMANCE REPORT ---")
 print(f"Total Transactions: {NUM_TRANSACTIONS}")
+print(f"Batch Size:         {BATCH_SIZE}")
+print(f"Workers:            {MAX_WORKERS}")
 print(f"Total Time:         {total_time:.2f} seconds")
-print(f"Avg Latency:        {statistics.mean(latencies):.2f} ms")
+print(f"Avg Latency:        {statistics.mean(latencies):.2f} ms (per request)")
 print(f"Max Latency:        {max(latencies):.2f} ms")
 print(f"Throughput:         {NUM_TRANSACTIONS / total_time:.0f} tx/sec")
 
 print(f"\n--- COMPLIANCE BREAKDOWN ---")
 print(f"Strict Liability Blocks: {decisions['BLOCK']} (Ex-Ante Enforcement)")
 print(f"Risk Flags:              {decisions['FLAG']}")
-print(f"Settled Instantly:       {decisions['ALLOW']}")
\ No newline at end of file
+print(f"Settled Instantly:       {decisions['ALLOW']}")
@@ -0,0 +1,77 @@
+"""Request-handling tests for the screening endpoints in api_server.py.
+
+The endpoints read and validate the raw body themselves; these check that they
+reject the same bodies, with the same errors, as a FastAPI-declared JSON body.
+
+Run with: python -m unittest test_api
+"""
+import json
+import unittest
+
+from fastapi.testclient import TestClient
+
+import api_server
+
+TX = {"id": "a", "originator": {"kyc": True}, "beneficiary": {}, "amount": 5,
+      "currency": "EUR"}
+
+
+class BodyParsingTest(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(api_server.app)
+        self.client.__enter__()
+        self.addCleanup(self.client.__exit__, None, None, None)
+
+    def post(self, path, body, content_type):
+        headers = {"content-type": content_type} if content_type else {}
+        return self.client.post(path, content=body, headers=headers)
+
+    def test_json_content_types_are_screened(self):
+        for content_type in ("application/json", "application/json; charset=utf-8",
+                             "application/vnd.api+json"):
+            r = self.post("/enforce", json.dumps(TX), content_type)
+            self.assertEqual(r.status_code, 200, content_type)
+            self.assertEqual(r.json()["decision"], "ALLOW")
+
+    def test_non_json_content_types_are_rejected(self):
+        # A browser can send these cross-site without a preflight.
+        for content_type in ("text/plain", "application/x-www-form-urlencoded", None):
+            before = api_server.STATS.snapshot()
+            r = self.post("/enforce", json.dumps(TX), content_type)
+            self.assertEqual(r.status_code, 422, content_type)
+            [err] = r.json()["detail"]
+            self.assertEqual((err["type"], err["loc"]), ("model_attributes_type", ["body"]))
+            r = self.post("/enforce_batch", json.dumps([TX]), content_type)
+            self.assertEqual(r.status_code, 422, content_type)
+            [err] = r.json()["detail"]
+            self.assertEqual((err["type"], err["loc"]), ("list_type", ["body"]))
+            self.assertEqual(api_server.STATS.snapshot(), before)
+
+    def test_malformed_json_gets_fastapis_decode_error(self):
+        for path in ("/enforce", "/enforce_batch"):
+            r = self.post(path, '{"id": "a",', "application/json")
+            self.assertEqual(r.status_code, 422)
+            self.assertEqual(r.json()["detail"], [{
+                "type": "json_invalid", "loc": ["body", 11], "msg": "JSON decode error",
+                "input": {},
+                "ctx": {"error": "Expecting property name enclosed in double quotes"},
+            }])
+
+    def test_empty_body_is_missing(self):
+        for path in ("/enforce", "/enforce_batch"):
+            r = self.post(path, b"", "application/json")
+            self.assertEqual(r.status_code, 422)
+            self.assertEqual(r.json()["detail"], [
+                {"type": "missing", "loc": ["body"], "msg": "Field required", "input": None},
+            ])
+
+    def test_field_errors_are_located_in_the_body(self):
+        r = self.post("/enforce_batch", json.dumps([TX, {**TX, "amount": "x"}]),
+                      "application/json")
+        self.assertEqual(r.status_code, 422)
+        [err] = r.json()["detail"]
+        self.assertEqual((err["type"], err["loc"]), ("float_parsing", ["body", 1, "amount"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,290 @@
+"""Differential tests for the compiled policy engine in api_server.py.
+
+Every result is checked against `reference_evaluate`, a direct tree walk over
+the raw rule specs with the original engine's semantics (evaluate every rule
+in (-priority, name) order, pick the max of (action rank, priority)).
+
+Run with: python -m unittest test_engine
+"""
+import math
+import random
+import unittest
+from unittest import mock
+
+import yaml
+
+import api_server
+from api_server import PolicyEngine, load_rules_from_yaml
+
+ACTION_RANK = {"block": 2, "flag": 1, "allow": 0}
+ALWAYS = {"field": "__always__", "op": "eq", "value": True}
+
+
+def reference_node(spec, tx):
+    if "all" in spec or "any" in spec:
+        mode = "all" if "all" in spec else "any"
+        results = (reference_node(child, tx) for child in spec[mode])
+        return all(results) if mode == "all" else any(results)
+    v = tx
+    for part in spec["field"].split("."):
+        if not isinstance(v, dict) or part not in v:
+            v = None
+            break
+        v = v[part]
+    if v is None:
+        return False
+    op, value = spec["op"], spec["value"]
+    if op == "gt": return v > value
+    if op == "lt": return v < value
+    if op == "eq": return v == value
+    if op == "in": return v in value
+    raise ValueError(f"Unknown operator: {op!r}")
+
+
+def reference_evaluate(specs, tx):
+    ordered = sorted(specs, key=lambda r: (-int(r.get("priority", 0)), r["name"]))
+    trace, matched = [], []
+    for r in ordered:
+        result = reference_node(r.get("when") or ALWAYS, tx)
+        trace.append({"rule": r["name"], "result": bool(result)})
+        if result: matched.append(r)
+    chosen = None
+    if matched:
+        chosen = max(
+            matched, key=lambda r: (ACTION_RANK[r["action"]], int(r.get("priority", 0)))
+        )
+    return {
+        "decision": chosen["action"] if chosen else "allow",
+        "rule": chosen["name"] if chosen else None,
+        "matched_rules": [r["name"] for r in matched],
+        "trace": trace,
+    }
+
+
+def outcome(fn, *args, **kwargs):
+    """Result of fn, or the exception type it raised."""
+    try:
+        return fn(*args, **kwargs)
+    except Exception as e:
+        return type(e)
+
+
+def engine_for(specs, cached):
+    # CACHE_MIN_RULES is read when the engine is built; 0 forces the cache on.
+    with mock.patch.object(api_server, "CACHE_MIN_RULES", 0 if cached else 10 ** 9):
+        return PolicyEngine(load_rules_from_yaml(yaml.safe_dump(specs)))
+
+
+class EngineDiffMixin:
+    def assert_matches_reference(self, specs, txs):
+        """Traced evaluate() must equal the reference exactly; the fast path,
+        uncached and cached, must pick the same decision and rule. When the
+        reference raises, the fast path may legitimately stop before the
+        failing comparison, so only the traced path is held to raising."""
+        plain, cached = engine_for(specs, False), engine_for(specs, True)
+        for tx in txs:
+            expected = outcome(reference_evaluate, specs, tx)
+            traced = outcome(plain.evaluate, tx, collect_trace=True)
+            self.assertEqual(traced, expected, (specs, tx))
+            if isinstance(expected, type): continue
+            want = (expected["decision"], expected["rule"])
+            for engine in (plain, cached):
+                got = engine.evaluate(tx)
+                self.assertEqual((got["decision"], got["rule"]), want, (specs, tx))
+        return cached
+
+
+def rule_specs(conditions, actions=("block", "flag", "allow")):
+    return [
+        {"name": f"r{i}", "when": cond,
+         "action": actions[i % len(actions)], "priority": i % 3}
+        for i, cond in enumerate(conditions)
+    ]
+
+
+NAN = float("nan")
+INF = float("inf")
+
+AMOUNTS = [0, 1, True, False, 1.0, 5.5, 99.5, 100, 100.0, 100.5, 101, 100000, 100000.0,
+           250000, -1, NAN, INF, -INF, None, "100", [1], {"a": 1}]
+
+
+class DecisionCacheTest(EngineDiffMixin, unittest.TestCase):
+    def test_bool_and_int_values_share_equal_keys_only_when_equal(self):
+        specs = rule_specs([
+            {"field": "amount", "op": "eq", "value": 1},
+            {"field": "amount", "op": "gt", "value": True},
+            {"field": "kyc", "op": "eq", "value": True},
+            {"field": "kyc", "op": "in", "value": [1, 2]},
+        ])
+        values = [1, True, 1.0, 0, False, 2, 2.0, None]
+        txs = [{"amount": a, "kyc": k} for a in values for k in values]
+        self.assert_matches_reference(specs, txs * 2)
+
+    def test_nan_never_lands_in_a_threshold_bucket(self):
+        specs = rule_specs([
+            {"field": "amount", "op": "eq", "value": 100},
+            {"field": "amount", "op": "gt", "value": 50},
+            {"field": "amount", "op": "lt", "value": NAN},
+        ])
+        # A single threshold maps 100 to (0, 1); NaN must not share that key.
+        txs = [{"amount": a} for a in (100, NAN, math.nan, 100.0, NAN)]
+        self.assert_matches_reference(specs, txs)
+
+    def test_mixed_int_and_float_thresholds(self):
+        specs = rule_specs([
+            {"all": [
+                {"field": "amount", "op": "gt", "value": 100},
+                {"field": "amount", "op": "lt", "value": 100.5},
+            ]},
+            {"field": "amount", "op": "eq", "value": 100.0},
+            {"field": "amount", "op": "eq", "value": 100.5},
+            {"field": "amount", "op": "gt", "value": INF},
+            {"field": "amount", "op": "lt", "value": -INF},
+        ])
+        amounts = [99, 99.99, 100, 100.0, 100.25, 100.5, 101, INF, -INF, 10 ** 20]
+        self.assert_matches_reference(specs, [{"amount": a} for a in amounts * 2])
+
+    def test_unhashable_values_fall_through_to_the_uncached_decider(self):
+        specs = rule_specs([
+            {"field": "originator", "op": "eq", "value": {"kyc": False}},
+            {"field": "tags", "op": "in", "value": [["vip"], ["pep"]]},
+            {"field": "amount", "op": "gt", "value": 10},
+        ])
+        txs = [
+            {"originator": {"kyc": False}, "tags": ["vip"], "amount": 5},
+            {"originator": {"kyc": True}, "tags": ["pep"], "amount": 50},
+            {"originator": {"kyc": True}, "tags": ["x"], "amount": 50},
+            {"originator": "str", "tags": None, "amount": 5},
+        ]
+        cached = self.assert_matches_reference(specs, txs * 2)
+        # Only the all-hashable tx could be cached.
+        cache = cached._decide.cache
+        self.assertEqual(len(cache), 1)
+
+    def test_cache_is_bounded(self):
+        specs = rule_specs([{"field": "id", "op": "eq", "value": "x"}])
+        engine = engine_for(specs, True)
+        for i in range(api_server.DECISION_CACHE_SIZE + 10):
+            engine.evaluate({"id": i})
+        cache = engine._decide.cache
+        self.assertLessEqual(len(cache), api_server.DECISION_CACHE_SIZE)
+
+    def test_random_rule_sets(self):
+        rnd = random.Random(0)
+        fields = ["amount", "currency", "originator.kyc", "originator", "missing.x"]
+        values = {
+            "gt": [0, 1, 100, 100.0, 100.5, 5.5, INF, NAN, True],
+            "lt": [0, 1, 100, 100.0, 100.5, 5.5, INF, NAN, True],
+            "eq": [True, False, 1, 0, 100, 100.0, "EUR", None, NAN],
+            "in": [["EUR", "USD"], [1, True], [100, 100.5], [[1]], [{"a": 1}]],
+        }
+
+        def condition(depth=0):
+            if depth < 2 and rnd.random() < 0.3:
+                mode = rnd.choice(["all", "any"])
+                return {mode: [condition(depth + 1) for _ in range(rnd.randint(0, 3))]}
+            op = rnd.choice(list(values))
+            return {"field": rnd.choice(fields), "op": op, "value": rnd.choice(values[op])}
+
+        def tx():
+            return {
+                "amount": rnd.choice(AMOUNTS),
+                "currency": rnd.choice(["EUR", "USD", None, 1]),
+                "originator": rnd.choice(
+                    [{"kyc": rnd.choice([True, False, 1, 0, None])}, {}, "str", None]
+                ),
+            }
+
+        for _ in range(150):
+            specs = [
+                {
+                    "name": f"r{rnd.randint(0, 9)}_{i}",
+                    "when": condition() if rnd.random() < 0.9 else {},
+                    "action": rnd.choice(list(ACTION_RANK)),
+                    "priority": rnd.randint(0, 5),
+                }
+                for i in range(rnd.randint(1, 8))
+            ]
+            txs = [tx() for _ in range(30)]
+            self.assert_matches_reference(specs, txs + txs)
+
+
+A = {"field": "currency", "op": "eq", "value": "EUR"}
+B = {"field": "amount", "op": "gt", "value": 100}
+C = {"field": "originator.kyc", "op": "eq", "value": False}
+
+
+NAMES = {(): "tx", ("currency",): "c", ("amount",): "a", ("originator", "kyc"): "k"}
+
+
+def rendered(specs, names=NAMES):
+    """render_rules' lines for specs, which are given in precedence order."""
+    rules = load_rules_from_yaml(yaml.safe_dump(specs))
+    items = [(api_server.conjuncts(r.root), f"_r{i}") for i, r in enumerate(rules)]
+    return api_server.render_rules(items, {}, names)
+
+
+def all_txs():
+    return [
+        {"currency": c, "amount": a, "originator": {"kyc": k}}
+        for c in ("EUR", "USD", None) for a in (50, 150, None) for k in (True, False, None)
+    ]
+
+
+class SharedPrefixTest(EngineDiffMixin, unittest.TestCase):
+    def test_shared_leading_condition_is_tested_once(self):
+        specs = [
+            {"name": "a", "when": {"all": [A, B]}, "action": "block", "priority": 3},
+            {"name": "b", "when": {"all": [A, C]}, "action": "block", "priority": 2},
+            {"name": "c", "when": {"all": [A, B, C]}, "action": "flag", "priority": 1},
+            {"name": "d", "when": B, "action": "flag", "priority": 0},
+        ]
+        lines = rendered(specs)
+        self.assertEqual(sum("c == " in line for line in lines), 1)
+        self.assertEqual(lines[0], "if (c is not None and c == _c0):")
+        self.assertTrue(all(line.startswith("    ") for line in lines[1:-1]))
+        self.assertFalse(lines[-1].startswith(" "))
+        self.assert_matches_reference(specs, all_txs())
+
+    def test_rule_that_runs_out_of_conditions_ends_its_group(self):
+        specs = [
+            {"name": "a", "when": {"all": [A, B]}, "action": "block", "priority": 3},
+            {"name": "b", "when": A, "action": "block", "priority": 2},
+            {"name": "c", "when": {"all": [A, C]}, "action": "block", "priority": 1},
+            {"name": "d", "when": C, "action": "flag", "priority": 0},
+        ]
+        lines = rendered(specs)
+        # "b" matches whenever the shared A does, so "c" can never be reached
+        # and is not emitted; "d" after the group still is.
+        self.assertIn("    return _r1", lines)
+        self.assertFalse(any("_r2" in line for line in lines))
+        self.assertTrue(lines[-1].endswith("return _r3"))
+        self.assert_matches_reference(specs, all_txs())
+
+    def test_prefixes_deeper_than_max_shared_depth_are_emitted_flat(self):
+        chain = [{"field": f"f{i}", "op": "eq", "value": 1} for i in range(150)]
+        x1 = {"field": "x", "op": "eq", "value": 1}
+        x2 = {"field": "x", "op": "eq", "value": 2}
+        specs = [
+            {"name": "a", "when": {"all": chain + [x1]}, "action": "block", "priority": 2},
+            {"name": "b", "when": {"all": chain + [x2]}, "action": "flag", "priority": 1},
+            {"name": "c", "when": {"all": chain}, "action": "flag", "priority": 0},
+        ]
+        base = {f"f{i}": 1 for i in range(150)}
+        txs = [
+            dict(base, x=1), dict(base, x=2), dict(base, x=3),
+            dict(base, f149=0, x=1), dict(base, f0=None),
+        ]
+        # 150 nested ifs would pass Python's 100-level indentation limit; the
+        # engine has to compile regardless.
+        self.assert_matches_reference(specs, txs)
+        with mock.patch.object(api_server, "MAX_SHARED_DEPTH", 2):
+            names = {(): "tx", ("x",): "x", **{(f"f{i}",): f"v{i}" for i in range(150)}}
+            lines = rendered(specs, names)
+            self.assertEqual(max(len(line) - len(line.lstrip()) for line in lines), 8)
+            self.assert_matches_reference(specs, txs)
+
+
+if __name__ == "__main__":
+    unittest.main()